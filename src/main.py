@@ -1,10 +1,12 @@
 """Main entry point for the attachment agent."""
+import math
 import os
 import sys
 import logging
 from dotenv import load_dotenv
 from services.gmail_service import GmailService
 from services.dropbox_service import DropboxService
+from services.storage_backend import LocalStorageBackend
 from processors.attachment_processor import AttachmentProcessor
 
 # Configure logging
@@ -20,15 +22,48 @@ def check_credentials():
         logger.error('Missing .env file. Copy .env.example to .env and configure it.')
         sys.exit(1)
     
-    if not os.getenv('DROPBOX_ACCESS_TOKEN'):
-        logger.error('Missing DROPBOX_ACCESS_TOKEN in .env file')
+    if not os.getenv('DROPBOX_ACCESS_TOKEN') and not os.getenv('DROPBOX_LOCAL_ROOT'):
+        logger.error('Missing DROPBOX_ACCESS_TOKEN (or DROPBOX_LOCAL_ROOT for a local storage backend) in .env file')
         sys.exit(1)
     
+    if os.getenv('DROPBOX_LOCAL_ROOT'):
+        # Latency settings may be zero; a request rate must be positive
+        for name, allow_zero in [('DROPBOX_LOCAL_LATENCY', True),
+                                 ('DROPBOX_LOCAL_LATENCY_JITTER', True),
+                                 ('DROPBOX_LOCAL_REQUESTS_PER_SECOND', False)]:
+            value = os.getenv(name)
+            if not value:
+                continue
+            try:
+                number = float(value)
+            except ValueError:
+                number = math.nan
+            if not math.isfinite(number) or number < 0 or (number == 0 and not allow_zero):
+                requirement = 'a non-negative number' if allow_zero else 'a positive number'
+                logger.error(f'Invalid {name} in .env file: {value!r} (must be {requirement})')
+                sys.exit(1)
+    
     credentials_path = os.getenv('GMAIL_CREDENTIALS_PATH', 'credentials.json')
     if not os.path.exists(credentials_path):
         logger.error(f'Missing Gmail credentials file: {credentials_path}')
         sys.exit(1)
 
+def create_dropbox_service() -> DropboxService:
+    """Create the Dropbox service, backed by a local folder if DROPBOX_LOCAL_ROOT is set."""
+    local_root = os.getenv('DROPBOX_LOCAL_ROOT')
+    if not local_root:
+        return DropboxService()
+    
+    requests_per_second = os.getenv('DROPBOX_LOCAL_REQUESTS_PER_SECOND')
+    backend = LocalStorageBackend(
+        local_root,
+        latency=float(os.getenv('DROPBOX_LOCAL_LATENCY', '0')),
+        latency_jitter=float(os.getenv('DROPBOX_LOCAL_LATENCY_JITTER', '0')),
+        requests_per_second=float(requests_per_second) if requests_per_second else None
+    )
+    logger.info(f'Using local storage backend at {backend.root}')
+    return DropboxService(client=backend)
+
 def main():
     """Run the attachment agent."""
     # Load and verify credentials
@@ -41,7 +76,7 @@ def main():
             os.getenv('GMAIL_CREDENTIALS_PATH', 'credentials.json'),
             os.getenv('GMAIL_TOKEN_PATH', 'token.pickle')
         )
-        dropbox = DropboxService()
+        dropbox = create_dropbox_service()
         processor = AttachmentProcessor()
         
         # Authenticate Gmail
@@ -5,16 +5,23 @@ from pathlib import Path
 import dropbox
 from dropbox.exceptions import ApiError
 from dropbox.files import WriteMode
+from .storage_backend import StorageBackend
 
 class DropboxService:
     """Service for interacting with Dropbox API."""
     
-    def __init__(self, access_token: Optional[str] = None):
-        """Initialize the Dropbox service with authentication."""
+    def __init__(self, access_token: Optional[str] = None, client: Optional[StorageBackend] = None):
+        """Initialize the Dropbox service with authentication.
+
+        Pass `client` to use another storage backend (e.g. LocalStorageBackend)
+        instead of the Dropbox API; no access token is needed then.
+        """
         self.access_token = access_token or os.getenv('DROPBOX_ACCESS_TOKEN')
-        if not self.access_token:
-            raise ValueError("Dropbox access token is required")
-        self.client = dropbox.Dropbox(self.access_token)
+        if client is None:
+            if not self.access_token:
+                raise ValueError("Dropbox access token is required")
+            client = dropbox.Dropbox(self.access_token)
+        self.client = client
         self.base_folder = "/Attachments"  # Root folder for all attachments
         
     def ensure_folder_exists(self, folder_path: str) -> None:
@@ -0,0 +1,507 @@
+"""Storage backends that can stand in for the Dropbox API client."""
+from typing import Dict, Optional, Protocol
+from datetime import datetime, timezone
+from pathlib import Path
+import base64
+import hashlib
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from dropbox import auth, files, sharing
+from dropbox.exceptions import ApiError, BadInputError, RateLimitError
+
+# Dropbox hashes file content in 4 MB blocks, see
+# https://www.dropbox.com/developers/reference/content-hash
+CONTENT_HASH_BLOCK_SIZE = 4 * 1024 * 1024
+
+def compute_content_hash(data: bytes) -> str:
+    """Compute the Dropbox content_hash of the given bytes."""
+    block_hashes = b''.join(
+        hashlib.sha256(data[i:i + CONTENT_HASH_BLOCK_SIZE]).digest()
+        for i in range(0, len(data), CONTENT_HASH_BLOCK_SIZE)
+    )
+    return hashlib.sha256(block_hashes).hexdigest()
+
+
+class StorageBackend(Protocol):
+    """The subset of the `dropbox.Dropbox` client used by DropboxService.
+
+    Implementations return the same `dropbox.files` / `dropbox.sharing`
+    result types and raise the same `dropbox.exceptions.ApiError` errors
+    as the real client, so callers cannot tell them apart.
+    """
+
+    def files_get_metadata(self, path: str) -> files.Metadata: ...
+
+    def files_create_folder_v2(self, path: str, autorename: bool = False) -> files.CreateFolderResult: ...
+
+    def files_upload(self, f: bytes, path: str, mode: files.WriteMode = files.WriteMode.add,
+                     autorename: bool = False, client_modified: Optional[datetime] = None,
+                     mute: bool = False, property_groups=None, strict_conflict: bool = False,
+                     content_hash: Optional[str] = None) -> files.FileMetadata: ...
+
+    def files_upload_session_start(self, f: bytes, close: bool = False, session_type=None,
+                                   content_hash: Optional[str] = None) -> files.UploadSessionStartResult: ...
+
+    def files_upload_session_append_v2(self, f: bytes, cursor: files.UploadSessionCursor,
+                                       close: bool = False, content_hash: Optional[str] = None) -> None: ...
+
+    def files_upload_session_finish(self, f: bytes, cursor: files.UploadSessionCursor,
+                                    commit: files.CommitInfo,
+                                    content_hash: Optional[str] = None) -> files.FileMetadata: ...
+
+    def files_list_folder(self, path: str) -> files.ListFolderResult: ...
+
+    def sharing_create_shared_link(self, path: str, short_url: bool = False,
+                                   pending_upload=None) -> sharing.PathLinkMetadata: ...
+
+
+class _WriteFailed(Exception):
+    """Raised internally when a write is rejected; wraps a `files.WriteError`."""
+
+    def __init__(self, reason: files.WriteError):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class LocalStorageBackend:
+    """Dropbox-compatible storage backend rooted in a local directory.
+
+    Paths follow Dropbox semantics: they are absolute ("/folder/file"),
+    case-insensitive and case-preserving, and parent folders are created
+    on upload. Optional simulated latency and throttling let the pipeline
+    be benchmarked and soak-tested without touching the real service.
+
+    The backend assumes it is the only writer below `root`: folder names,
+    revisions, content hashes and client_modified times are kept in memory
+    as files are written, so lookups and metadata do not rescan folders or
+    re-read files. Files already under `root` at startup report their
+    modification time as client_modified.
+    """
+
+    # Prefix of the temporary files used for atomic writes; never listed.
+    TEMP_PREFIX = '.~upload-'
+
+    def __init__(self, root: str, latency: float = 0.0, latency_jitter: float = 0.0,
+                 requests_per_second: Optional[float] = None,
+                 max_retries_on_rate_limit: Optional[int] = None):
+        """Initialize the backend.
+
+        `latency` seconds (plus up to `latency_jitter` more) are slept on
+        every call. When `requests_per_second` is set, calls beyond that
+        rate are throttled: like `dropbox.Dropbox`, the backend sleeps and
+        retries up to `max_retries_on_rate_limit` times (forever if None)
+        before raising `RateLimitError`.
+        """
+        if latency < 0 or latency_jitter < 0:
+            raise ValueError("Latency must not be negative")
+        if requests_per_second is not None and requests_per_second <= 0:
+            raise ValueError("requests_per_second must be positive")
+        self.root = Path(root).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.requests_per_second = requests_per_second
+        self.max_retries_on_rate_limit = max_retries_on_rate_limit
+        self._burst = max(1.0, requests_per_second or 0.0)
+        self._tokens = self._burst
+        self._last_refill = time.monotonic()
+        self._throttle_lock = threading.Lock()
+        # Guards the indexes and sessions below; not held while file data is
+        # written or hashed, so concurrent uploads are not serialized
+        self._lock = threading.RLock()
+        # folder -> {casefolded child name: actual child name}
+        self._index: Dict[Path, Dict[str, str]] = {}
+        # file -> {rev, content_hash, size, client_modified, server_modified};
+        # replaced as a whole on every write so readers get a consistent snapshot
+        self._files: Dict[Path, Dict] = {}
+        self._sessions: Dict[str, Dict] = {}
+
+    # Simulated network behaviour
+
+    def _begin_request(self) -> str:
+        """Apply throttling and latency to a call and return its request id."""
+        request_id = uuid.uuid4().hex
+        self._throttle(request_id)
+        delay = self.latency + random.uniform(0, self.latency_jitter)
+        if delay:
+            time.sleep(delay)
+        return request_id
+
+    def _throttle(self, request_id: str) -> None:
+        """Block or raise RateLimitError once the request rate is exceeded."""
+        if self.requests_per_second is None:
+            return
+        retries = 0
+        while True:
+            with self._throttle_lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._burst,
+                    self._tokens + (now - self._last_refill) * self.requests_per_second
+                )
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                backoff = (1 - self._tokens) / self.requests_per_second
+            if self.max_retries_on_rate_limit is not None and retries >= self.max_retries_on_rate_limit:
+                error = auth.RateLimitError(
+                    reason=auth.RateLimitReason.too_many_requests,
+                    retry_after=math.ceil(backoff)
+                )
+                raise RateLimitError(request_id, error, backoff)
+            retries += 1
+            time.sleep(backoff)
+
+    # Path handling
+
+    def _split(self, request_id: str, path: str, allow_root: bool = False) -> list:
+        """Split a Dropbox path into components, rejecting malformed paths."""
+        if path == '' and allow_root:
+            return []
+        parts = path.split('/')
+        if not path.startswith('/') or any(p in ('', '.', '..') for p in parts[1:]):
+            raise BadInputError(request_id, f"Malformed path: {path!r}")
+        return parts[1:]
+
+    def _children(self, folder: Path) -> Dict[str, str]:
+        """Return a folder's name index, scanning the folder only on first use.
+
+        Callers must hold `self._lock`.
+        """
+        index = self._index.get(folder)
+        if index is None:
+            index = {}
+            if folder.is_dir():
+                index = {
+                    child.name.casefold(): child.name
+                    for child in folder.iterdir()
+                    if not child.name.startswith(self.TEMP_PREFIX)
+                }
+                self._index[folder] = index
+        return index
+
+    def _resolve(self, parts: list) -> Path:
+        """Map path components to the local path, matching case-insensitively.
+
+        Callers must hold `self._lock`.
+        """
+        current = self.root
+        for part in parts:
+            current = current / self._children(current).get(part.casefold(), part)
+        return current
+
+    def _add_child(self, local_path: Path) -> None:
+        """Record a newly created file or folder in its parent's index."""
+        self._children(local_path.parent)[local_path.name.casefold()] = local_path.name
+
+    def _make_folders(self, folder: Path) -> None:
+        """Create a folder and any missing parents, keeping the index current."""
+        missing = []
+        while not folder.exists():
+            missing.append(folder)
+            folder = folder.parent
+        for created in reversed(missing):
+            created.mkdir()
+            self._index[created] = {}
+            self._add_child(created)
+
+    def _display_path(self, local_path: Path) -> str:
+        """Return the Dropbox path_display for a local path."""
+        return '/' + local_path.relative_to(self.root).as_posix()
+
+    def _metadata(self, local_path: Path) -> files.Metadata:
+        """Build Dropbox metadata for an existing local file or folder."""
+        if local_path.is_dir():
+            path_display = self._display_path(local_path)
+            return files.FolderMetadata(
+                name=local_path.name,
+                id=self._file_id(path_display),
+                path_lower=path_display.lower(),
+                path_display=path_display
+            )
+        return self._file_metadata(local_path, self._file_info(local_path))
+
+    def _file_id(self, path_display: str) -> str:
+        """Derive a stable Dropbox-style id from a path."""
+        digest = hashlib.sha256(path_display.lower().encode('utf-8')).digest()[:16]
+        return 'id:' + base64.urlsafe_b64encode(digest).decode('ascii').rstrip('=')
+
+    def _file_metadata(self, local_path: Path, info: Dict) -> files.FileMetadata:
+        """Build FileMetadata from a snapshot of a file's stored details."""
+        path_display = self._display_path(local_path)
+        return files.FileMetadata(
+            name=local_path.name,
+            id=self._file_id(path_display),
+            client_modified=info['client_modified'],
+            server_modified=info['server_modified'],
+            rev=info['rev'],
+            size=info['size'],
+            path_lower=path_display.lower(),
+            path_display=path_display,
+            is_downloadable=True,
+            content_hash=info['content_hash']
+        )
+
+    @staticmethod
+    def _new_file_info(content_hash: str, size: int, client_modified: Optional[datetime] = None) -> Dict:
+        """Create the stored details for a file that is being written."""
+        # Dropbox reports naive UTC times truncated to whole seconds
+        server_modified = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+        return {
+            'rev': uuid.uuid4().hex,
+            'content_hash': content_hash,
+            'size': size,
+            'client_modified': client_modified.replace(microsecond=0) if client_modified else server_modified,
+            'server_modified': server_modified,
+        }
+
+    def _file_info(self, local_path: Path) -> Dict:
+        """Return the stored details (rev, content_hash, size, times) of a file.
+
+        Files written by this backend are recorded on write; files that were
+        already under `root` are hashed once, on first access.
+        """
+        with self._lock:
+            info = self._files.get(local_path)
+        if info is None:
+            stat = local_path.stat()
+            modified = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc).replace(tzinfo=None)
+            computed = self._new_file_info(self._file_content_hash(local_path), stat.st_size, modified)
+            computed['server_modified'] = modified
+            with self._lock:
+                info = self._files.setdefault(local_path, computed)
+        return info
+
+    @staticmethod
+    def _file_content_hash(local_path: Path) -> str:
+        """Compute the Dropbox content_hash of a local file without loading it whole."""
+        block_hashes = hashlib.sha256()
+        with open(local_path, 'rb') as f:
+            while block := f.read(CONTENT_HASH_BLOCK_SIZE):
+                block_hashes.update(hashlib.sha256(block).digest())
+        return block_hashes.hexdigest()
+
+    def _autorename(self, local_path: Path, is_folder: bool, conflicted_copy: bool = False) -> Path:
+        """Find a free sibling name for an item that is being written.
+
+        Like Dropbox, add-mode conflicts become "name (1).ext" and update-mode
+        conflicts become "name (conflicted copy).ext" ("name (conflicted copy 2).ext"
+        and so on if that is taken too). Folder names keep any dots intact.
+        """
+        stem, suffix = (local_path.name, '') if is_folder else (local_path.stem, local_path.suffix)
+        siblings = self._children(local_path.parent)
+        counter = 1
+        while True:
+            if conflicted_copy:
+                label = 'conflicted copy' if counter == 1 else f'conflicted copy {counter}'
+            else:
+                label = str(counter)
+            candidate = f"{stem} ({label}){suffix}"
+            if candidate.casefold() not in siblings:
+                return local_path.parent / candidate
+            counter += 1
+
+    def _check_ancestors(self, local_path: Path) -> None:
+        """Reject writes below an existing file."""
+        for parent in local_path.relative_to(self.root).parents:
+            if (self.root / parent).is_file():
+                raise _WriteFailed(files.WriteError.conflict(files.WriteConflictError.file_ancestor))
+
+    def _write(self, parts: list, data: bytes, mode: Optional[files.WriteMode], autorename: bool,
+               content_hash: Optional[str] = None,
+               client_modified: Optional[datetime] = None) -> files.FileMetadata:
+        """Write a file honouring Dropbox add/overwrite/update semantics.
+
+        The data is written to a temporary file without holding the lock;
+        the lock is only taken to create parent folders and to check for
+        conflicts and move the file into place. The returned metadata
+        describes this write, even if another writer replaces the file
+        right after.
+        """
+        mode = mode or files.WriteMode.add
+        content_hash = content_hash or compute_content_hash(data)
+        with self._lock:
+            target = self._resolve(parts)
+            self._check_ancestors(target)
+            self._make_folders(target.parent)
+        temp_path = target.parent / f"{self.TEMP_PREFIX}{uuid.uuid4().hex}"
+        try:
+            temp_path.write_bytes(data)
+            with self._lock:
+                # Resolve again: another writer may have created the file meanwhile
+                target = self._resolve(parts)
+                if target.is_dir():
+                    if not autorename:
+                        raise _WriteFailed(files.WriteError.conflict(files.WriteConflictError.folder))
+                    target = self._autorename(target, is_folder=False, conflicted_copy=mode.is_update())
+                elif target.exists():
+                    existing = self._file_info(target)
+                    if existing['content_hash'] == content_hash:
+                        # Dropbox treats re-uploading identical content as a no-op
+                        return self._file_metadata(target, existing)
+                    allowed = mode.is_overwrite() or (mode.is_update() and mode.get_update() == existing['rev'])
+                    if not allowed:
+                        if not autorename:
+                            raise _WriteFailed(files.WriteError.conflict(files.WriteConflictError.file))
+                        target = self._autorename(target, is_folder=False, conflicted_copy=mode.is_update())
+                os.replace(temp_path, target)
+                info = self._new_file_info(content_hash, len(data), client_modified)
+                self._files[target] = info
+                self._add_child(target)
+        finally:
+            temp_path.unlink(missing_ok=True)
+        return self._file_metadata(target, info)
+
+    # Dropbox client API
+
+    def files_get_metadata(self, path: str) -> files.Metadata:
+        """Return metadata for a file or folder."""
+        request_id = self._begin_request()
+        parts = self._split(request_id, path)
+        with self._lock:
+            local_path = self._resolve(parts)
+        if not local_path.exists():
+            raise ApiError(request_id, files.GetMetadataError.path(files.LookupError.not_found), None, None)
+        return self._metadata(local_path)
+
+    def files_create_folder_v2(self, path: str, autorename: bool = False) -> files.CreateFolderResult:
+        """Create a folder, including any missing parents."""
+        request_id = self._begin_request()
+        parts = self._split(request_id, path)
+        with self._lock:
+            local_path = self._resolve(parts)
+            try:
+                self._check_ancestors(local_path)
+                if local_path.exists():
+                    if not autorename:
+                        conflict = files.WriteConflictError.folder if local_path.is_dir() else files.WriteConflictError.file
+                        raise _WriteFailed(files.WriteError.conflict(conflict))
+                    local_path = self._autorename(local_path, is_folder=True)
+            except _WriteFailed as e:
+                raise ApiError(request_id, files.CreateFolderError.path(e.reason), None, None)
+            self._make_folders(local_path)
+        return files.CreateFolderResult(metadata=self._metadata(local_path))
+
+    def files_upload(self, f: bytes, path: str, mode: files.WriteMode = files.WriteMode.add,
+                     autorename: bool = False, client_modified: Optional[datetime] = None,
+                     mute: bool = False, property_groups=None, strict_conflict: bool = False,
+                     content_hash: Optional[str] = None) -> files.FileMetadata:
+        """Upload a file in a single request."""
+        request_id = self._begin_request()
+        parts = self._split(request_id, path)
+        actual_hash = compute_content_hash(f)
+        if content_hash is not None and content_hash != actual_hash:
+            raise ApiError(request_id, files.UploadError.content_hash_mismatch, None, None)
+        try:
+            return self._write(parts, f, mode, autorename, actual_hash, client_modified)
+        except _WriteFailed as e:
+            failure = files.UploadWriteFailed(reason=e.reason, upload_session_id='')
+            raise ApiError(request_id, files.UploadError.path(failure), None, None)
+
+    def files_upload_session_start(self, f: bytes, close: bool = False, session_type=None,
+                                   content_hash: Optional[str] = None) -> files.UploadSessionStartResult:
+        """Start an upload session with the first chunk of data."""
+        request_id = self._begin_request()
+        if content_hash is not None and content_hash != compute_content_hash(f):
+            raise ApiError(request_id, files.UploadSessionStartError('content_hash_mismatch'), None, None)
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._sessions[session_id] = {'chunks': [f], 'size': len(f), 'closed': close}
+        return files.UploadSessionStartResult(session_id=session_id)
+
+    def _lookup_session(self, cursor: files.UploadSessionCursor, allow_closed: bool):
+        """Find an upload session, returning it or an UploadSessionLookupError tag."""
+        session = self._sessions.get(cursor.session_id)
+        if session is None:
+            return None, 'not_found'
+        if session['closed'] and not allow_closed:
+            return None, 'closed'
+        if cursor.offset != session['size']:
+            return None, files.UploadSessionOffsetError(correct_offset=session['size'])
+        return session, None
+
+    def files_upload_session_append_v2(self, f: bytes, cursor: files.UploadSessionCursor,
+                                       close: bool = False, content_hash: Optional[str] = None) -> None:
+        """Append a chunk of data to an upload session."""
+        request_id = self._begin_request()
+        hash_matches = content_hash is None or content_hash == compute_content_hash(f)
+        with self._lock:
+            session, failure = self._lookup_session(cursor, allow_closed=False)
+            if isinstance(failure, files.UploadSessionOffsetError):
+                raise ApiError(request_id, files.UploadSessionAppendError.incorrect_offset(failure), None, None)
+            if failure is not None:
+                raise ApiError(request_id, files.UploadSessionAppendError(failure), None, None)
+            if not hash_matches:
+                raise ApiError(request_id, files.UploadSessionAppendError('content_hash_mismatch'), None, None)
+            session['chunks'].append(f)
+            session['size'] += len(f)
+            session['closed'] = close
+
+    def files_upload_session_finish(self, f: bytes, cursor: files.UploadSessionCursor,
+                                    commit: files.CommitInfo,
+                                    content_hash: Optional[str] = None) -> files.FileMetadata:
+        """Append the final chunk and commit the session's data to a file."""
+        request_id = self._begin_request()
+        parts = self._split(request_id, commit.path)
+        with self._lock:
+            session, failure = self._lookup_session(cursor, allow_closed=True)
+            if isinstance(failure, files.UploadSessionOffsetError):
+                failure = files.UploadSessionLookupError.incorrect_offset(failure)
+            elif failure is not None:
+                failure = files.UploadSessionLookupError(failure)
+            if failure is not None:
+                raise ApiError(request_id, files.UploadSessionFinishError.lookup_failed(failure), None, None)
+            # Take the session so no other call can use it while committing
+            del self._sessions[cursor.session_id]
+        committed = False
+        try:
+            data = b''.join(session['chunks']) + f
+            actual_hash = compute_content_hash(data)
+            if content_hash is not None and content_hash != actual_hash:
+                raise ApiError(request_id, files.UploadSessionFinishError.content_hash_mismatch, None, None)
+            try:
+                metadata = self._write(parts, data, commit.mode, commit.autorename, actual_hash,
+                                       commit.client_modified)
+            except _WriteFailed as e:
+                raise ApiError(request_id, files.UploadSessionFinishError.path(e.reason), None, None)
+            committed = True
+            return metadata
+        finally:
+            if not committed:
+                # Like Dropbox, leave the session usable for a retry
+                with self._lock:
+                    self._sessions[cursor.session_id] = session
+
+    def files_list_folder(self, path: str) -> files.ListFolderResult:
+        """List the direct children of a folder ('' is the root)."""
+        request_id = self._begin_request()
+        parts = self._split(request_id, path, allow_root=True)
+        with self._lock:
+            local_path = self._resolve(parts)
+            if not local_path.exists():
+                raise ApiError(request_id, files.ListFolderError.path(files.LookupError.not_found), None, None)
+            if not local_path.is_dir():
+                raise ApiError(request_id, files.ListFolderError.path(files.LookupError.not_folder), None, None)
+            names = sorted(self._children(local_path).values(), key=str.casefold)
+        entries = [self._metadata(local_path / name) for name in names]
+        return files.ListFolderResult(entries=entries, cursor=uuid.uuid4().hex, has_more=False)
+
+    def sharing_create_shared_link(self, path: str, short_url: bool = False,
+                                   pending_upload=None) -> sharing.PathLinkMetadata:
+        """Return a file:// link standing in for a Dropbox shared link."""
+        request_id = self._begin_request()
+        parts = self._split(request_id, path)
+        with self._lock:
+            local_path = self._resolve(parts)
+        if not local_path.exists():
+            raise ApiError(request_id, sharing.CreateSharedLinkError.path(files.LookupError.not_found), None, None)
+        return sharing.PathLinkMetadata(
+            url=local_path.as_uri(),
+            visibility=sharing.Visibility.public,
+            path=self._display_path(local_path).lower()
+        )
@@ -0,0 +1,291 @@
+"""Unit tests for the local storage backend."""
+import hashlib
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+from dropbox.exceptions import ApiError, BadInputError, RateLimitError
+from dropbox.files import CommitInfo, FileMetadata, FolderMetadata, UploadSessionCursor, WriteMode
+from src.services.dropbox_service import DropboxService
+from src.services.storage_backend import LocalStorageBackend, compute_content_hash
+
+class TestLocalStorageBackend(unittest.TestCase):
+    """Test cases for LocalStorageBackend class."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.backend = LocalStorageBackend(self.tempdir.name)
+
+    def test_compute_content_hash(self):
+        """Test content hash uses Dropbox's 4 MB block scheme."""
+        data = b'a' * (4 * 1024 * 1024 + 10)
+        blocks = hashlib.sha256(data[:4 * 1024 * 1024]).digest() + hashlib.sha256(data[4 * 1024 * 1024:]).digest()
+
+        self.assertEqual(compute_content_hash(data), hashlib.sha256(blocks).hexdigest())
+        self.assertEqual(compute_content_hash(b''), hashlib.sha256(b'').hexdigest())
+
+    def test_get_metadata_not_found(self):
+        """Test missing paths raise the same error as Dropbox."""
+        with self.assertRaises(ApiError) as ctx:
+            self.backend.files_get_metadata('/missing')
+
+        self.assertTrue(ctx.exception.error.is_path())
+        self.assertTrue(ctx.exception.error.get_path().is_not_found())
+
+    def test_malformed_path(self):
+        """Test relative and escaping paths are rejected."""
+        for path in ['relative', '/a/../b', '/trailing/']:
+            with self.assertRaises(BadInputError):
+                self.backend.files_get_metadata(path)
+
+    def test_create_folder(self):
+        """Test creating folders and conflicting with an existing one."""
+        result = self.backend.files_create_folder_v2('/Parent/Child')
+
+        self.assertIsInstance(result.metadata, FolderMetadata)
+        self.assertEqual(result.metadata.path_display, '/Parent/Child')
+        self.assertEqual(result.metadata.path_lower, '/parent/child')
+        with self.assertRaises(ApiError) as ctx:
+            self.backend.files_create_folder_v2('/parent/child')
+        self.assertTrue(ctx.exception.error.get_path().get_conflict().is_folder())
+        renamed = self.backend.files_create_folder_v2('/parent/child', autorename=True)
+        self.assertEqual(renamed.metadata.path_display, '/Parent/Child (1)')
+
+    def test_upload_and_metadata(self):
+        """Test uploading a file creates parents and reports Dropbox metadata."""
+        data = b'invoice data'
+
+        metadata = self.backend.files_upload(data, '/Attachments/invoice/Bill.pdf')
+
+        self.assertIsInstance(metadata, FileMetadata)
+        self.assertEqual(metadata.name, 'Bill.pdf')
+        self.assertEqual(metadata.size, len(data))
+        self.assertEqual(metadata.content_hash, compute_content_hash(data))
+        self.assertEqual(self.backend.files_get_metadata('/attachments/INVOICE/bill.pdf'), metadata)
+
+    def test_upload_add_mode_conflict(self):
+        """Test add mode conflicts on different content and autorenames."""
+        self.backend.files_upload(b'first', '/file.txt')
+
+        unchanged = self.backend.files_upload(b'first', '/file.txt')
+        with self.assertRaises(ApiError) as ctx:
+            self.backend.files_upload(b'second', '/file.txt')
+        renamed = self.backend.files_upload(b'second', '/file.txt', autorename=True)
+
+        self.assertEqual(unchanged.path_display, '/file.txt')
+        self.assertTrue(ctx.exception.error.get_path().reason.get_conflict().is_file())
+        self.assertEqual(renamed.path_display, '/file (1).txt')
+
+    def test_upload_overwrite_and_update_modes(self):
+        """Test overwrite replaces content and update checks the revision."""
+        original = self.backend.files_upload(b'first', '/file.txt')
+
+        overwritten = self.backend.files_upload(b'second', '/file.txt', mode=WriteMode.overwrite)
+        with self.assertRaises(ApiError):
+            self.backend.files_upload(b'third', '/file.txt', mode=WriteMode.update(original.rev))
+        updated = self.backend.files_upload(b'third', '/file.txt', mode=WriteMode.update(overwritten.rev))
+
+        self.assertEqual(overwritten.content_hash, compute_content_hash(b'second'))
+        self.assertEqual(updated.content_hash, compute_content_hash(b'third'))
+
+    def test_concurrent_overwrites_return_own_metadata(self):
+        """Test each concurrent upload's response describes its own payload."""
+        payloads = [f'payload {i}'.encode() * (i + 1) for i in range(200)]
+
+        def upload(data):
+            return data, self.backend.files_upload(data, '/shared.txt', mode=WriteMode.overwrite)
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(upload, payloads))
+
+        for data, metadata in results:
+            self.assertEqual(metadata.content_hash, compute_content_hash(data))
+            self.assertEqual(metadata.size, len(data))
+        self.assertEqual(len({metadata.rev for _, metadata in results}), len(payloads))
+
+    def test_update_mode_autorenames_to_conflicted_copy(self):
+        """Test a stale update is renamed the way Dropbox names conflicted copies."""
+        original = self.backend.files_upload(b'first', '/doc.txt')
+        self.backend.files_upload(b'second', '/doc.txt', mode=WriteMode.overwrite)
+
+        first = self.backend.files_upload(b'third', '/doc.txt', mode=WriteMode.update(original.rev), autorename=True)
+        second = self.backend.files_upload(b'fourth', '/doc.txt', mode=WriteMode.update(original.rev), autorename=True)
+
+        self.assertEqual(first.path_display, '/doc (conflicted copy).txt')
+        self.assertEqual(second.path_display, '/doc (conflicted copy 2).txt')
+
+    def test_upload_onto_folder_autorenames_as_file(self):
+        """Test a file conflicting with a folder keeps its extension when renamed."""
+        self.backend.files_create_folder_v2('/a.txt')
+
+        metadata = self.backend.files_upload(b'data', '/a.txt', autorename=True)
+
+        self.assertEqual(metadata.path_display, '/a (1).txt')
+
+    def test_upload_client_modified(self):
+        """Test the supplied client_modified is stored and returned."""
+        client_modified = datetime(2020, 1, 1, 12, 30, 15, 123456)
+
+        metadata = self.backend.files_upload(b'data', '/file.txt', client_modified=client_modified)
+
+        self.assertEqual(metadata.client_modified, datetime(2020, 1, 1, 12, 30, 15))
+        self.assertNotEqual(metadata.server_modified, metadata.client_modified)
+        self.assertEqual(self.backend.files_get_metadata('/file.txt').client_modified, metadata.client_modified)
+
+    def test_update_mode_rejects_stale_rev_with_same_mtime(self):
+        """Test revisions do not depend on filesystem timestamp resolution."""
+        original = self.backend.files_upload(b'first', '/file.txt')
+        local_path = Path(self.tempdir.name) / 'file.txt'
+        stat = local_path.stat()
+
+        overwritten = self.backend.files_upload(b'second', '/file.txt', mode=WriteMode.overwrite)
+        os.utime(local_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        self.assertNotEqual(overwritten.rev, original.rev)
+        with self.assertRaises(ApiError):
+            self.backend.files_upload(b'third', '/file.txt', mode=WriteMode.update(original.rev))
+
+    def test_upload_into_indexed_folder_does_not_scan(self):
+        """Test new uploads look names up in the index instead of listing the folder."""
+        self.backend.files_upload(b'a', '/folder/a.txt')
+        self.backend.files_upload(b'b', '/folder/b.txt')
+
+        with patch.object(Path, 'iterdir') as mock_iterdir:
+            metadata = self.backend.files_upload(b'c', '/FOLDER/c.txt')
+            renamed = self.backend.files_upload(b'd', '/folder/a.txt', autorename=True)
+
+        mock_iterdir.assert_not_called()
+        self.assertEqual(metadata.path_display, '/folder/c.txt')
+        self.assertEqual(renamed.path_display, '/folder/a (1).txt')
+
+    def test_metadata_does_not_rehash_files(self):
+        """Test metadata uses the content_hash stored when the file was written."""
+        self.backend.files_upload(b'data', '/folder/file.txt')
+
+        with patch.object(LocalStorageBackend, '_file_content_hash') as mock_hash:
+            entries = self.backend.files_list_folder('/folder').entries
+            metadata = self.backend.files_get_metadata('/folder/file.txt')
+
+        mock_hash.assert_not_called()
+        self.assertEqual(entries[0].content_hash, compute_content_hash(b'data'))
+        self.assertEqual(metadata, entries[0])
+
+    def test_existing_files_are_indexed(self):
+        """Test files already under the root are found and hashed."""
+        (Path(self.tempdir.name) / 'Existing').mkdir()
+        (Path(self.tempdir.name) / 'Existing' / 'Old.txt').write_bytes(b'old')
+        backend = LocalStorageBackend(self.tempdir.name)
+
+        metadata = backend.files_get_metadata('/existing/old.txt')
+
+        self.assertEqual(metadata.path_display, '/Existing/Old.txt')
+        self.assertEqual(metadata.content_hash, compute_content_hash(b'old'))
+
+    def test_upload_below_file_conflicts(self):
+        """Test uploads below an existing file are rejected."""
+        self.backend.files_upload(b'data', '/file.txt')
+
+        with self.assertRaises(ApiError) as ctx:
+            self.backend.files_upload(b'data', '/file.txt/nested.txt')
+
+        self.assertTrue(ctx.exception.error.get_path().reason.get_conflict().is_file_ancestor())
+
+    def test_upload_content_hash_mismatch(self):
+        """Test uploads are rejected when the supplied content_hash is wrong."""
+        with self.assertRaises(ApiError) as ctx:
+            self.backend.files_upload(b'data', '/file.txt', content_hash=compute_content_hash(b'other'))
+
+        self.assertTrue(ctx.exception.error.is_content_hash_mismatch())
+
+    def test_upload_session(self):
+        """Test uploading a file in chunks through an upload session."""
+        start = self.backend.files_upload_session_start(b'abc')
+        cursor = UploadSessionCursor(session_id=start.session_id, offset=3)
+        self.backend.files_upload_session_append_v2(b'def', cursor)
+
+        with self.assertRaises(ApiError) as ctx:
+            self.backend.files_upload_session_append_v2(b'ghi', cursor)
+        self.assertEqual(ctx.exception.error.get_incorrect_offset().correct_offset, 6)
+
+        cursor = UploadSessionCursor(session_id=start.session_id, offset=6)
+        metadata = self.backend.files_upload_session_finish(b'ghi', cursor, CommitInfo(path='/big.bin'))
+
+        self.assertEqual(metadata.content_hash, compute_content_hash(b'abcdefghi'))
+        with self.assertRaises(ApiError) as ctx:
+            self.backend.files_upload_session_finish(b'', cursor, CommitInfo(path='/big.bin'))
+        self.assertTrue(ctx.exception.error.get_lookup_failed().is_not_found())
+
+    def test_upload_session_survives_failed_commit(self):
+        """Test a session can be retried after the commit fails with an OSError."""
+        start = self.backend.files_upload_session_start(b'abc')
+        cursor = UploadSessionCursor(session_id=start.session_id, offset=3)
+
+        with patch('src.services.storage_backend.os.replace', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                self.backend.files_upload_session_finish(b'def', cursor, CommitInfo(path='/big.bin'))
+        metadata = self.backend.files_upload_session_finish(b'def', cursor, CommitInfo(path='/big.bin'))
+
+        self.assertEqual(metadata.content_hash, compute_content_hash(b'abcdef'))
+
+    def test_list_folder(self):
+        """Test listing a folder's direct children."""
+        self.backend.files_upload(b'b', '/folder/b.txt')
+        self.backend.files_upload(b'a', '/folder/A.txt')
+        self.backend.files_create_folder_v2('/folder/sub')
+
+        result = self.backend.files_list_folder('/folder')
+
+        self.assertEqual([e.name for e in result.entries], ['A.txt', 'b.txt', 'sub'])
+        self.assertFalse(result.has_more)
+        self.assertEqual([e.name for e in self.backend.files_list_folder('').entries], ['folder'])
+        with self.assertRaises(ApiError) as ctx:
+            self.backend.files_list_folder('/missing')
+        self.assertTrue(ctx.exception.error.get_path().is_not_found())
+
+    def test_create_shared_link(self):
+        """Test shared links point at the stored file."""
+        self.backend.files_upload(b'data', '/file.txt')
+
+        link = self.backend.sharing_create_shared_link('/FILE.txt')
+
+        self.assertTrue(link.url.startswith('file://'))
+        self.assertEqual(link.path, '/file.txt')
+        with self.assertRaises(ApiError):
+            self.backend.sharing_create_shared_link('/missing.txt')
+
+    @patch('src.services.storage_backend.time.sleep')
+    def test_simulated_latency(self, mock_sleep):
+        """Test each call sleeps for the configured latency."""
+        backend = LocalStorageBackend(self.tempdir.name, latency=0.5)
+
+        backend.files_list_folder('')
+
+        mock_sleep.assert_called_once_with(0.5)
+
+    @patch('src.services.storage_backend.time.sleep')
+    def test_throttling_raises_after_retries(self, mock_sleep):
+        """Test calls beyond the request rate raise RateLimitError."""
+        backend = LocalStorageBackend(self.tempdir.name, requests_per_second=1, max_retries_on_rate_limit=2)
+
+        backend.files_list_folder('')
+        with self.assertRaises(RateLimitError) as ctx:
+            backend.files_list_folder('')
+
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertTrue(ctx.exception.error.reason.is_too_many_requests())
+
+    def test_dropbox_service_with_local_backend(self):
+        """Test DropboxService runs end to end against the local backend."""
+        service = DropboxService(client=self.backend)
+
+        result = service.upload_file(b'invoice data', 'bill.pdf', 'invoice')
+
+        self.assertEqual(result['path'], '/Attachments/invoice/bill.pdf')
+        self.assertTrue(result['shared_link'].startswith('file://'))
+        self.assertEqual([e.name for e in service.list_category_contents('invoice')], ['bill.pdf'])
+        self.assertEqual(service.list_category_contents('photo'), [])